@@ -15,6 +15,8 @@ import sys
 from datetime import datetime, timedelta
 from typing import List, Optional
 
+from result_history import HistoryRecorder
+
 __author__ = "Vincent Lin"
 
 EXAMPLE_DUMP = """\
@@ -87,7 +89,8 @@ def format_dump_datetime(dt: datetime) -> str:
     return string
 
 
-def compare_fs_lines(example: List[str], yours: List[str]) -> bool:
+def compare_fs_lines(example: List[str], yours: List[str],
+                     recorder: Optional[HistoryRecorder] = None) -> bool:
     def print_field(name: str, example: str, yours: str) -> None:
         # Right-fill to match spacing of original dump.
         name_prefix = (name + ":").ljust(27)
@@ -107,6 +110,10 @@ def compare_fs_lines(example: List[str], yours: List[str]) -> bool:
         correct_value = example_parts[1].strip()
         your_value = your_line.split(":", maxsplit=1)[1].strip()
 
+        # The datetime fields below only get displayed for reference
+        # and don't count as mismatches.
+        field_ok = True
+
         # Process special datetime values.  These will be different from
         # the ones in the example, but they must be correct with respect
         # to each other (last write == last checked, next check == last
@@ -125,8 +132,11 @@ def compare_fs_lines(example: List[str], yours: List[str]) -> bool:
 
         # A mismatch!
         elif example_line != your_line:
+            field_ok = False
             diff_found = True
 
+        if recorder is not None:
+            recorder.record(field_name, field_ok, correct_value, your_value)
         print_field(field_name, correct_value, your_value)
 
     # Chances are you probably did not use `current_time` for fields.
@@ -163,7 +173,8 @@ def replace_capturing_groups(regexp: str) -> str:
     return result.replace("\\", "")
 
 
-def compare_group_line(example: str, yours: str, regexp: str) -> bool:
+def compare_group_line(example: str, yours: str, regexp: str,
+                       recorder: Optional[HistoryRecorder] = None) -> bool:
     diff_found = False
 
     def get_expr(example: str, yours: Optional[str] = None) -> str:
@@ -193,10 +204,17 @@ def compare_group_line(example: str, yours: str, regexp: str) -> bool:
     formatted = template.format(*expressions)
     print(formatted)
 
+    # Record the whole line under its template, e.g. "Block bitmap at
+    # {0} (+{1})", since group lines don't have field names.
+    if recorder is not None:
+        recorder.record(template.strip(), not diff_found,
+                        example.strip(), yours.strip())
+
     return not diff_found
 
 
-def compare_group_lines(example: List[str], yours: List[str]) -> bool:
+def compare_group_lines(example: List[str], yours: List[str],
+                        recorder: Optional[HistoryRecorder] = None) -> bool:
     passing = True
 
     regexps = (
@@ -211,7 +229,7 @@ def compare_group_lines(example: List[str], yours: List[str]) -> bool:
     )
 
     for example_line, your_line, regexp in zip(example, yours, regexps):
-        if not compare_group_line(example_line, your_line, regexp):
+        if not compare_group_line(example_line, your_line, regexp, recorder):
             passing = False
 
     # Make a note about the consistency of free blocks/inodes and how
@@ -227,15 +245,20 @@ def compare_group_lines(example: List[str], yours: List[str]) -> bool:
 def main() -> int:
     example_lines = EXAMPLE_DUMP.splitlines()
     your_lines = get_your_dump().splitlines()
+    recorder = HistoryRecorder("check_dump")
 
     example_fs_lines = example_lines[:31]
     example_group_lines = example_lines[33:]
     your_fs_lines = your_lines[:31]
     your_group_lines = your_lines[33:]
 
-    diff_passed = compare_fs_lines(example_fs_lines, your_fs_lines)
+    diff_passed = compare_fs_lines(example_fs_lines, your_fs_lines,
+                                   recorder)
     print("\n")
-    group_passed = compare_group_lines(example_group_lines, your_group_lines)
+    group_passed = compare_group_lines(example_group_lines, your_group_lines,
+                                       recorder)
+
+    recorder.flush()
 
     exit_success = (diff_passed and group_passed)
     print("\n")
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""result_history.py
+
+Record the results of check_dump.py and test_lab4_ext.py in a local
+SQLite database so you can see which fields regressed across commits.
+Each run is keyed by the hash of your ext2-create.c source and the hash
+of the cs111-base.img it produced.
+
+USAGE: `./result_history.py broke "Free blocks"`
+
+USAGE: `./result_history.py declining --window 5`
+
+USAGE: `./result_history.py runs --image 73cb38`
+
+USAGE: `./result_history.py --help`
+"""
+
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import hashlib
+import sqlite3
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, ArgumentTypeError
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+__author__ = "Vincent Lin"
+
+DB_FILE = Path(".lab4-history.db")
+SOURCE_FILE = Path("ext2-create.c")
+IMG_FILE = Path("cs111-base.img")
+
+RED = "\x1b[31m"
+GREEN = "\x1b[32m"
+YELLOW = "\x1b[33m"
+END = "\x1b[0m"
+
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY,
+    tool        TEXT NOT NULL,
+    commit_hash TEXT,
+    source_hash TEXT,
+    image_hash  TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id      INTEGER NOT NULL REFERENCES runs (id),
+    check_name  TEXT NOT NULL,
+    passed      INTEGER NOT NULL,
+    expected    TEXT,
+    actual      TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_commit ON runs (commit_hash);
+CREATE INDEX IF NOT EXISTS runs_by_source ON runs (source_hash);
+CREATE INDEX IF NOT EXISTS runs_by_image ON runs (image_hash);
+CREATE INDEX IF NOT EXISTS results_by_check
+    ON results (check_name, passed, run_id);
+CREATE INDEX IF NOT EXISTS results_by_run
+    ON results (run_id, passed);
+"""
+
+# The first failing run after the most recent passing run for a check.
+# If the check has never passed, this is simply its first failing run.
+FIRST_BROKEN_QUERY = """\
+SELECT runs.id, runs.commit_hash, runs.source_hash, runs.image_hash,
+       runs.recorded_at, results.expected, results.actual
+FROM results JOIN runs ON runs.id = results.run_id
+WHERE results.check_name = :name
+  AND results.passed = 0
+  AND results.run_id > COALESCE(
+      (SELECT MAX(run_id) FROM results
+       WHERE check_name = :name AND passed = 1), 0)
+ORDER BY results.run_id
+LIMIT 1
+"""
+
+CHECK_EXISTS_QUERY = """\
+SELECT 1 FROM results WHERE check_name = :name LIMIT 1
+"""
+
+# Compare each check's pass rate over its latest `window` results with
+# its pass rate over the `window` results before those.
+DECLINING_QUERY = """\
+WITH ranked AS (
+    SELECT check_name, passed,
+           ROW_NUMBER() OVER (PARTITION BY check_name
+                              ORDER BY run_id DESC) AS age
+    FROM results
+)
+SELECT check_name,
+       AVG(CASE WHEN age <= :window THEN passed END) AS recent,
+       AVG(CASE WHEN age > :window THEN passed END) AS previous
+FROM ranked
+WHERE age <= 2 * :window
+GROUP BY check_name
+HAVING recent < previous
+ORDER BY previous - recent DESC, check_name
+"""
+
+
+# Summarize the runs whose hashes start with the given prefixes.  The
+# range comparisons (rather than LIKE) let SQLite use the hash indexes;
+# hashes are lowercase hex, so "g" sorts after every possible suffix.
+# Grouping on results.run_id keeps the planner from preferring a full
+# scan of runs in id order over the hash index.
+RUNS_QUERY = """\
+SELECT runs.id, runs.tool, runs.commit_hash, runs.source_hash,
+       runs.image_hash, runs.recorded_at,
+       SUM(results.passed) AS passed, COUNT(*) AS total
+FROM runs JOIN results ON results.run_id = runs.id
+WHERE {clauses}
+GROUP BY results.run_id
+ORDER BY results.run_id
+"""
+
+HASH_COLUMNS = ("commit_hash", "source_hash", "image_hash")
+
+
+def run(script: str) -> subprocess.CompletedProcess[bytes]:
+    return subprocess.run(script, shell=True, capture_output=True, check=False)
+
+
+def hash_file(path: Path) -> Optional[str]:
+    if not path.exists():
+        return None
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def get_commit_hash() -> Optional[str]:
+    process = run("git rev-parse HEAD")
+    if process.returncode != 0:
+        return None
+    return process.stdout.decode().strip()
+
+
+def connect(db_path: Path = DB_FILE) -> sqlite3.Connection:
+    connection = sqlite3.connect(db_path)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def setup_schema(connection: sqlite3.Connection) -> None:
+    # WAL keeps recording cheap and lets queries run alongside a batch
+    # of graders writing to the same database.
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.executescript(SCHEMA)
+
+
+class HistoryRecorder:
+    """Buffer check results in memory and write them as a single run.
+
+    The hashes are computed on construction, so create the recorder
+    after cs111-base.img has been generated and before anything cleans
+    it up.
+    """
+
+    def __init__(self, tool: str, db_path: Path = DB_FILE) -> None:
+        self.tool = tool
+        self.db_path = db_path
+        self.commit_hash = get_commit_hash()
+        self.source_hash = hash_file(SOURCE_FILE)
+        self.image_hash = hash_file(IMG_FILE)
+        self.pending: List[Tuple[str, bool, str, str]] = []
+
+    def record(self, name: str, passed: bool, expected: str = "",
+               actual: str = "") -> None:
+        self.pending.append((name, passed, expected, actual))
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+
+        # Recording is optional, so a broken or locked history database
+        # must never change the outcome of the checks themselves.
+        try:
+            connection = connect(self.db_path)
+        except sqlite3.Error as error:
+            self.warn(error)
+            return
+
+        try:
+            setup_schema(connection)
+            # One transaction for the run and all of its results.
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO runs (tool, commit_hash, source_hash, "
+                    "image_hash, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.tool, self.commit_hash, self.source_hash,
+                     self.image_hash, time.time()))
+                run_id = cursor.lastrowid
+                connection.executemany(
+                    "INSERT INTO results (run_id, check_name, passed, "
+                    "expected, actual) VALUES (?, ?, ?, ?, ?)",
+                    ((run_id, name, int(passed), expected, actual)
+                     for name, passed, expected, actual in self.pending))
+        except sqlite3.Error as error:
+            self.warn(error)
+            return
+        finally:
+            connection.close()
+
+        self.pending.clear()
+
+    def warn(self, error: sqlite3.Error) -> None:
+        sys.stderr.write(f"{YELLOW}WARNING: Could not record results in "
+                         f"{self.db_path}: {error}{END}\n")
+
+
+def check_exists(connection: sqlite3.Connection, name: str) -> bool:
+    row = connection.execute(CHECK_EXISTS_QUERY, {"name": name}).fetchone()
+    return row is not None
+
+
+def first_broken(connection: sqlite3.Connection, name: str
+                 ) -> Optional[sqlite3.Row]:
+    return connection.execute(FIRST_BROKEN_QUERY, {"name": name}).fetchone()
+
+
+def declining(connection: sqlite3.Connection, window: int
+              ) -> List[sqlite3.Row]:
+    return connection.execute(DECLINING_QUERY, {"window": window}).fetchall()
+
+
+def find_runs(connection: sqlite3.Connection, commit: Optional[str] = None,
+              source: Optional[str] = None, image: Optional[str] = None
+              ) -> List[sqlite3.Row]:
+    clauses = ["1"]
+    params: Dict[str, str] = {}
+    for column, prefix in zip(HASH_COLUMNS, (commit, source, image)):
+        if prefix is None:
+            continue
+        clauses.append(f"runs.{column} >= :{column} "
+                       f"AND runs.{column} < :{column} || 'g'")
+        params[column] = prefix.lower()
+    query = RUNS_QUERY.format(clauses=" AND ".join(clauses))
+    return connection.execute(query, params).fetchall()
+
+
+def positive_int(value: str) -> int:
+    as_int = int(value)
+    if as_int <= 0:
+        raise ArgumentTypeError(f"{value} is not a positive integer.")
+    return as_int
+
+
+parser = ArgumentParser(prog=sys.argv[0],
+                        description="Query the recorded check history.")
+
+parser.add_argument("--db", metavar="FILE", type=Path, default=DB_FILE,
+                    help=f"history database to query (default: {DB_FILE})")
+
+subparsers = parser.add_subparsers(dest="command", required=True)
+
+broke_parser = subparsers.add_parser(
+    "broke", help="show the first run where a check started failing")
+broke_parser.add_argument("name", metavar="CHECK",
+                          help="field name or test method name")
+
+declining_parser = subparsers.add_parser(
+    "declining", help="list checks whose pass rate is dropping")
+declining_parser.add_argument("-w", "--window", metavar="NRUNS",
+                              type=positive_int, default=5,
+                              help="number of recent runs to compare")
+
+runs_parser = subparsers.add_parser(
+    "runs", help="list recorded runs, optionally filtered by hash prefix")
+runs_parser.add_argument("-c", "--commit", metavar="HASH",
+                         help="only runs of commits starting with HASH")
+runs_parser.add_argument("-s", "--source", metavar="HASH",
+                         help="only runs whose ext2-create.c hash "
+                              "starts with HASH")
+runs_parser.add_argument("-i", "--image", metavar="HASH",
+                         help="only runs whose cs111-base.img hash "
+                              "starts with HASH")
+
+
+def format_timestamp(timestamp: float) -> str:
+    return time.strftime("%a %b %d %H:%M:%S %Y", time.localtime(timestamp))
+
+
+def print_first_broken(connection: sqlite3.Connection, name: str) -> int:
+    # Don't report a typo as a passing check.
+    if not check_exists(connection, name):
+        sys.stderr.write(f"{RED}Unknown check {name!r}. Group lines are "
+                         f"recorded under their template, e.g. "
+                         f"'Block bitmap at {{0}} (+{{1}})'.{END}\n")
+        return 1
+
+    row = first_broken(connection, name)
+    if row is None:
+        print(f"{GREEN}{name!r} is not currently failing.{END}")
+        return 0
+
+    recorded = format_timestamp(row["recorded_at"])
+    print(f"{RED}{name!r} broke in run {row['id']} ({recorded}){END}")
+    print(f"  Commit:      {row['commit_hash'] or '<not available>'}")
+    print(f"  Source hash: {row['source_hash'] or '<not available>'}")
+    print(f"  Image hash:  {row['image_hash'] or '<not available>'}")
+    if row["expected"] or row["actual"]:
+        print(f"  Expected:    {GREEN}{row['expected']}{END}")
+        print(f"  Yours:       {RED}{row['actual']}{END}")
+    return 1
+
+
+def print_declining(connection: sqlite3.Connection, window: int) -> int:
+    rows = declining(connection, window)
+    if not rows:
+        print(f"{GREEN}No pass rates are dropping.{END}")
+        return 0
+
+    for row in rows:
+        previous = f"{row['previous']:.0%}"
+        recent = f"{row['recent']:.0%}"
+        print(f"{row['check_name']:<40} {GREEN}{previous:>4}{END} -> "
+              f"{RED}{recent:>4}{END}")
+    return 1
+
+
+def print_runs(connection: sqlite3.Connection, commit: Optional[str],
+               source: Optional[str], image: Optional[str]) -> int:
+    rows = find_runs(connection, commit, source, image)
+    if not rows:
+        sys.stderr.write(f"{YELLOW}No recorded runs match.{END}\n")
+        return 1
+
+    for row in rows:
+        color = GREEN if row["passed"] == row["total"] else RED
+        print(f"Run {row['id']} ({row['tool']}, "
+              f"{format_timestamp(row['recorded_at'])}): "
+              f"{color}{row['passed']}/{row['total']} passed{END}")
+        print(f"  Commit:      {row['commit_hash'] or '<not available>'}")
+        print(f"  Source hash: {row['source_hash'] or '<not available>'}")
+        print(f"  Image hash:  {row['image_hash'] or '<not available>'}")
+    return 0
+
+
+def main() -> int:
+    namespace = parser.parse_args()
+    db_path: Path = namespace.db
+
+    if not db_path.exists():
+        sys.stderr.write(f"{YELLOW}No history recorded at {db_path} yet. "
+                         f"Run check_dump.py or test_lab4_ext.py first."
+                         f"{END}\n")
+        return 1
+
+    try:
+        connection = connect(db_path)
+    except sqlite3.Error as error:
+        sys.stderr.write(f"{RED}Could not read history from {db_path}: "
+                         f"{error}{END}\n")
+        return 1
+
+    try:
+        if namespace.command == "broke":
+            return print_first_broken(connection, namespace.name)
+        if namespace.command == "runs":
+            return print_runs(connection, namespace.commit,
+                              namespace.source, namespace.image)
+        return print_declining(connection, namespace.window)
+    except sqlite3.Error as error:
+        sys.stderr.write(f"{RED}Could not read history from {db_path}: "
+                         f"{error}{END}\n")
+        return 1
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,7 +20,7 @@ fi
 tarball_name=$(sed -En 's/suite: (.+)$/\1/p' Makefile)
 suite_files=$(sed -En 's/SUITE_FILES = (.+)/\1/p' Makefile | tr ' ' '\n')
 
-ignore_additions="\n# Test suite\n*.tar\n${suite_files}\n"
+ignore_additions="\n# Test suite\n*.tar\n.lab4-history.db*\n${suite_files}\n"
 
 # Their .gitignore has already set up this test suite before.
 if grep -q '# Test suite' "${lab_dir}/.gitignore" 2>/dev/null; then